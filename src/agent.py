@@ -4,11 +4,13 @@ General-purpose agent for interpreting messages and generating responses
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+import time
 from typing import Optional, Dict, Any
 
 from .config import Config
-from .utils import extract_json_from_text
+from .utils import extract_json_from_text, json_loads
 
 
 class OllamaAgent:
@@ -28,42 +30,91 @@ class OllamaAgent:
         self.temperature = Config.OLLAMA_TEMPERATURE
         self.system_prompt = Config.get_system_prompt()
         
+        # Request fields that never change between calls
+        self._payload_template = {
+            "model": self.model,
+            "stream": True,
+            "system": self.system_prompt,
+            "options": {
+                "temperature": self.temperature
+            }
+        }
+        self._tags_url = self.api_url.replace("/api/generate", "/api/tags")
+        
+        # Reuse one pooled keep-alive session for all Ollama calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Connection": "keep-alive",
+            "Accept-Encoding": "gzip, deflate"
+        })
+        
+        # Streaming response currently being read, if any
+        self._active_response: Optional[requests.Response] = None
+        
         self.logger.info(f"Agent initialized with model: {self.model}")
         
     def query_llm(self, prompt: str) -> Optional[str]:
         """
         Query Ollama LLM and get response
         
+        The response is streamed and the connection is closed as soon as a
+        complete JSON object has been generated, so the model does not spend
+        time on trailing text that would be discarded.
+        
         Args:
             prompt: User prompt to send to LLM
         
         Returns:
             LLM response text or None if error
         """
-        self.logger.debug(f"Querying LLM with prompt: {prompt[:100]}...")
+        self.logger.debug("Querying LLM with prompt: %.100s...", prompt)
         
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "system": self.system_prompt,
-                "options": {
-                    "temperature": self.temperature
-                }
-            }
+            payload = {**self._payload_template, "prompt": prompt}
             
-            response = requests.post(
+            chunks = []
+            # The read timeout only bounds gaps between chunks; cap the whole call too
+            deadline = time.monotonic() + self.timeout
+            with self.session.post(
                 self.api_url, 
                 json=payload, 
-                timeout=self.timeout
-            )
-            response.raise_for_status()
+                timeout=self.timeout,
+                stream=True
+            ) as response:
+                self._active_response = response
+                response.raise_for_status()
+                
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if time.monotonic() > deadline:
+                        self.logger.error(f"LLM query timed out after {self.timeout}s")
+                        return None
+                    
+                    if not line:
+                        continue
+                    
+                    result = json_loads(line)
+                    if "error" in result:
+                        self.logger.error(f"LLM API error: {result['error']}")
+                        return None
+                    
+                    token = result.get("response", "")
+                    chunks.append(token)
+                    
+                    if result.get("done"):
+                        break
+                    
+                    # Stop generation once a complete JSON object has arrived
+                    if "}" in token and extract_json_from_text("".join(chunks), partial=True) is not None:
+                        self.logger.debug("Complete JSON received, closing LLM stream early")
+                        break
             
-            result = response.json()
-            llm_response = result.get("response", "").strip()
+            llm_response = "".join(chunks).strip()
             
-            self.logger.debug(f"LLM responded with: {llm_response[:200]}...")
+            self.logger.debug("LLM responded with: %.200s...", llm_response)
             return llm_response
             
         except requests.exceptions.Timeout:
@@ -75,6 +126,8 @@ class OllamaAgent:
         except Exception as e:
             self.logger.error(f"Unexpected error querying LLM: {e}")
             return None
+        finally:
+            self._active_response = None
     
     def process_message(self, message: str) -> Optional[Dict[str, Any]]:
         """
@@ -86,7 +139,7 @@ class OllamaAgent:
         Returns:
             Response dictionary or None if unable to generate response
         """
-        self.logger.info(f"Processing message: {message[:100]}...")
+        self.logger.info("Processing message: %.100s...", message)
         
         # Query LLM
         llm_response = self.query_llm(message)
@@ -102,7 +155,7 @@ class OllamaAgent:
             self.logger.warning(f"Could not extract JSON from LLM response: {llm_response}")
             return None
         
-        self.logger.info(f"Generated response: {response_data}")
+        self.logger.info("Generated response: %s", response_data)
         return response_data
     
     def test_connection(self) -> bool:
@@ -116,10 +169,7 @@ class OllamaAgent:
         
         try:
             # Try to query available models
-            response = requests.get(
-                self.api_url.replace("/api/generate", "/api/tags"),
-                timeout=5
-            )
+            response = self.session.get(self._tags_url, timeout=5)
             
             if response.status_code == 200:
                 models = response.json().get('models', [])
@@ -138,4 +188,11 @@ class OllamaAgent:
         except requests.exceptions.RequestException as e:
             self.logger.error(f"✗ Cannot connect to Ollama: {e}")
             self.logger.error("Make sure Ollama is running: ollama serve")
-            return False
\ No newline at end of file
+            return False
+    
+    def close(self):
+        """Close the underlying HTTP session, aborting any in-flight LLM stream"""
+        response = self._active_response
+        if response is not None:
+            response.close()
+        self.session.close()
\ No newline at end of file
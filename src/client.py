@@ -4,19 +4,71 @@ Handles WebSocket connection, message processing, and fragment reconstruction
 """
 
 import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
 import websockets
+from websockets.protocol import State
 import json
 import logging
-from typing import Optional, Dict, Any, List
+from operator import itemgetter
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Union
 
 from .config import Config
 from .agent import OllamaAgent
-from .utils import is_fragmented_message
+from .utils import is_fragmented_message, json_loads, json_dumps
+
+
+def _to_text(raw_message: Union[str, bytes]) -> str:
+    """Decode an undecoded frame payload for display or LLM input"""
+    if isinstance(raw_message, str):
+        return raw_message
+    return raw_message.decode("utf-8", errors="replace")
+
+
+class _DaemonThreadExecutor(concurrent.futures.Executor):
+    """
+    Executor that runs each call on its own daemon thread
+    
+    Calls on the default executor (asyncio.to_thread) are joined when the
+    loop and interpreter shut down, so a pending LLM call or input() would
+    hold up Ctrl+C. Daemon threads are simply abandoned on exit.
+    """
+    
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        
+        threading.Thread(target=run, daemon=True).start()
+        return future
 
 
 class WebSocketClient:
     """WebSocket client that manages connection and message handling"""
     
+    # How long the writer waits for more responses before flushing a batch
+    BATCH_WINDOW = 0.005
+    
+    # How long a normal exit waits for queued responses to be sent
+    FLUSH_TIMEOUT = 5.0
+    
+    # Incomplete fragment groups kept before the least recent is dropped
+    MAX_FRAGMENT_GROUPS = 1024
+    
+    # Frames with the same key set seen before message handling is specialized
+    SPECIALIZE_AFTER = 64
+    
     def __init__(self, agent: OllamaAgent, logger: logging.Logger):
         """
         Initialize WebSocket client
@@ -31,10 +83,25 @@ class WebSocketClient:
         self.timeout = Config.WEBSOCKET_TIMEOUT
         self.auto_mode = Config.AUTO_MODE
         self.enable_fragments = Config.ENABLE_FRAGMENT_RECONSTRUCTION
+        self.batch_size = max(1, Config.WEBSOCKET_BATCH_SIZE)
+        
+        # Outbound responses, drained by the writer task
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._send_error: Optional[Exception] = None
+        
+        # Runs blocking calls without delaying shutdown
+        self._executor = _DaemonThreadExecutor()
+        
+        # Manual-mode input read from stdin but not yet consumed
+        self._stdin_buffer = b""
         
         # Fragment tracking
-        self.fragments = {}
-        self.message_buffer = []
+        self.fragments: OrderedDict[str, List[Dict[str, Any]]] = OrderedDict()
+        
+        # Frame-shape specialization state
+        self._handle_impl = self._handle_generic
+        self._shape_keys: Optional[frozenset] = None
+        self._shape_count = 0
         
     def reconstruct_fragments(self, fragments: List[Dict[str, Any]]) -> Optional[str]:
         """
@@ -49,144 +116,369 @@ class WebSocketClient:
         if not fragments:
             return None
         
-        # Sort fragments by sequence/timestamp
-        sorted_fragments = sorted(
-            fragments,
-            key=lambda x: x.get('sequence', x.get('timestamp', x.get('index', 0)))
-        )
-        
-        # Extract text from each fragment
-        texts = []
-        for frag in sorted_fragments:
+        # Resolve each fragment's sort key and text once
+        items = []
+        for frag in fragments:
+            key = frag.get('sequence', frag.get('timestamp', frag.get('index', 0)))
             # Try different common keys for message content
             text = (frag.get('text') or 
                    frag.get('content') or 
                    frag.get('message') or 
-                   frag.get('data') or 
-                   str(frag))
+                   frag.get('data'))
             if text:
-                texts.append(str(text))
+                items.append((key, text if isinstance(text, str) else str(text)))
+            else:
+                self.logger.warning("Fragment has no text content, skipping (keys: %s)", list(frag))
+        
+        # Sort fragments by sequence/timestamp
+        items.sort(key=itemgetter(0))
+        texts = [text for _, text in items]
         
         if texts:
             reconstructed = ' '.join(texts)
-            self.logger.info(f"Reconstructed message from {len(fragments)} fragments")
+            self.logger.info("Reconstructed message from %d fragments", len(fragments))
             return reconstructed
         
         return None
     
-    async def handle_message(self, raw_message: str) -> Optional[str]:
+    async def handle_message(self, raw_message: Union[str, bytes]) -> Optional[str]:
         """
         Process incoming WebSocket message
         
         Args:
-            raw_message: Raw message from WebSocket
+            raw_message: Raw message from WebSocket, as text or undecoded bytes
         
         Returns:
             Processed message text or None if waiting for more fragments
         """
-        self.logger.debug(f"Received raw message: {raw_message[:200]}...")
+        return self._handle_impl(raw_message)
+    
+    def _parse_frame(self, raw_message: Union[str, bytes]) -> Any:
+        """
+        Parse a frame as JSON
+        
+        Args:
+            raw_message: Raw message from WebSocket
+        
+        Returns:
+            Parsed JSON, or None if the frame is plain text
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Received raw message: %s...", _to_text(raw_message[:200]))
         
-        # Try to parse as JSON
         try:
-            data = json.loads(raw_message)
-        except json.JSONDecodeError:
+            return json_loads(raw_message)
+        except (json.JSONDecodeError, UnicodeDecodeError):
             # Not JSON, treat as plain text
             self.logger.debug("Message is plain text, not JSON")
-            return raw_message
+            return None
+    
+    def _handle_generic(self, raw_message: Union[str, bytes]) -> Optional[str]:
+        """Handle a frame of any shape"""
+        return self._dispatch(self._parse_frame(raw_message), raw_message)
+    
+    def _handle_fragment_only(self, raw_message: Union[str, bytes]) -> Optional[str]:
+        """Handle a frame expected to have the learned fragment shape"""
+        data = self._parse_frame(raw_message)
+        if not isinstance(data, dict) or data.keys() != self._shape_keys:
+            return self._despecialize(data, raw_message)
+        return self._handle_fragment(data)
+    
+    def _handle_content_only(self, raw_message: Union[str, bytes]) -> Optional[str]:
+        """Handle a frame expected to have the learned content shape"""
+        data = self._parse_frame(raw_message)
+        if not isinstance(data, dict) or data.keys() != self._shape_keys:
+            return self._despecialize(data, raw_message)
+        return self._extract_content(data, raw_message)
+    
+    def _despecialize(self, data: Any, raw_message: Union[str, bytes]) -> Optional[str]:
+        """Return to generic handling after a frame breaks the learned shape"""
+        self.logger.debug("Frame shape changed, using generic message handling")
+        self._handle_impl = self._handle_generic
+        self._shape_keys = None
+        self._shape_count = 0
+        return self._dispatch(data, raw_message)
+    
+    def _dispatch(self, data: Any, raw_message: Union[str, bytes]) -> Optional[str]:
+        """
+        Route a parsed frame by shape, specializing once the shape is stable
         
-        # Store in buffer
-        self.message_buffer.append(data)
+        Whether a frame is a fragment depends only on which keys it has, so
+        after SPECIALIZE_AFTER frames with the same key set the fragment check
+        is skipped until a frame with different keys arrives.
+        
+        Args:
+            data: Parsed frame, or None for plain text
+            raw_message: Raw message from WebSocket
+        
+        Returns:
+            Processed message text or None if waiting for more fragments
+        """
+        if not isinstance(data, dict):
+            self._shape_count = 0
+            # A JSON string frame carries its text directly
+            if isinstance(data, str):
+                return data
+            return _to_text(raw_message)
         
         # Check if this is a fragment (if fragment reconstruction is enabled)
-        if self.enable_fragments and is_fragmented_message(data):
-            fragment_id = data.get('id', data.get('message_id', 'default'))
-            
-            if fragment_id not in self.fragments:
-                self.fragments[fragment_id] = []
-            
-            self.fragments[fragment_id].append(data)
-            
-            # Check if we have all fragments
-            total = data.get('total', data.get('total_fragments', data.get('count', 0)))
-            current_count = len(self.fragments[fragment_id])
-            
-            if total > 0 and current_count >= total:
-                # We have all fragments, reconstruct
-                reconstructed = self.reconstruct_fragments(self.fragments[fragment_id])
-                self.fragments[fragment_id] = []  # Clear fragments
-                return reconstructed
-            else:
-                # Still waiting for more fragments
-                self.logger.info(f"Fragment {current_count}/{total} received, waiting...")
-                return None
+        fragmented = self.enable_fragments and is_fragmented_message(data)
+        
+        if data.keys() == self._shape_keys:
+            self._shape_count += 1
+            if self._shape_count >= self.SPECIALIZE_AFTER:
+                self._handle_impl = (self._handle_fragment_only if fragmented
+                                     else self._handle_content_only)
+                self.logger.debug("Frame shape stable, specialized message handling")
+        else:
+            self._shape_keys = frozenset(data)
+            self._shape_count = 1
+        
+        if fragmented:
+            return self._handle_fragment(data)
+        return self._extract_content(data, raw_message)
+    
+    def _handle_fragment(self, data: Dict[str, Any]) -> Optional[str]:
+        """
+        Store a fragment and reconstruct its message once complete
+        
+        Args:
+            data: Fragment dictionary
+        
+        Returns:
+            Reconstructed message text or None if waiting for more fragments
+        """
+        fragment_id = data.get('id', data.get('message_id', 'default'))
+        
+        if fragment_id in self.fragments:
+            self.fragments.move_to_end(fragment_id)
+        else:
+            self.fragments[fragment_id] = []
+            if len(self.fragments) > self.MAX_FRAGMENT_GROUPS:
+                evicted_id, _ = self.fragments.popitem(last=False)
+                self.logger.warning(f"Dropping incomplete fragment group: {evicted_id}")
+        
+        self.fragments[fragment_id].append(data)
         
-        # Not a fragment, extract message content
-        if isinstance(data, dict):
-            message = (data.get('message') or 
-                      data.get('text') or 
-                      data.get('content') or 
-                      str(data))
-            return message
+        # Check if we have all fragments
+        total = data.get('total', data.get('total_fragments', data.get('count', 0)))
+        current_count = len(self.fragments[fragment_id])
+        
+        if total > 0 and current_count >= total:
+            # We have all fragments, reconstruct
+            reconstructed = self.reconstruct_fragments(self.fragments[fragment_id])
+            del self.fragments[fragment_id]  # Clear fragments
+            return reconstructed
+        else:
+            # Still waiting for more fragments
+            self.logger.info("Fragment %s/%s received, waiting...", current_count, total)
+            return None
+    
+    def _extract_content(self, data: Dict[str, Any], raw_message: Union[str, bytes]) -> str:
+        """
+        Extract message content from a non-fragment frame
+        
+        Args:
+            data: Message dictionary
+            raw_message: Raw message from WebSocket
+        
+        Returns:
+            Message text
+        """
+        message = (data.get('message') or 
+                  data.get('text') or 
+                  data.get('content'))
+        if message:
+            return message if isinstance(message, str) else str(message)
         
-        return str(data)
+        # No recognised content key, pass the original JSON through
+        return _to_text(raw_message)
     
     async def send_response(self, websocket, response_data: Dict[str, Any]):
         """
-        Send response to WebSocket
+        Queue response to be sent to WebSocket
         
         Args:
             websocket: WebSocket connection
             response_data: Response data to send
         """
-        response_json = json.dumps(response_data)
-        self.logger.info(f"Sending: {response_json}")
-        await websocket.send(response_json)
+        await self._outbox.put(response_data)
+    
+    async def _writer(self, websocket):
+        """
+        Drain the outbox, coalescing responses that arrive within
+        BATCH_WINDOW into a single frame (up to batch_size)
+        
+        Args:
+            websocket: WebSocket connection
+        """
+        try:
+            while True:
+                batch = [await self._outbox.get()]
+                
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(
+                            await asyncio.wait_for(self._outbox.get(), self.BATCH_WINDOW)
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                
+                payload = batch[0] if len(batch) == 1 else {"batch": batch}
+                response_json = json_dumps(payload)
+                if self.logger.isEnabledFor(logging.INFO):
+                    self.logger.info("Sending: %s", response_json.decode())
+                # Send the encoded bytes as a text frame, skipping a str round-trip
+                await websocket.send(response_json, text=True)
+                for _ in batch:
+                    self._outbox.task_done()
+        except Exception as e:
+            self.logger.error(f"Failed to send response: {e}")
+            self._send_error = e
+            # Close the connection so the receive loop in run() stops too
+            await websocket.close(code=1011, reason="Failed to send response")
+            raise
+    
+    async def _flush_outbox(self, writer: asyncio.Task):
+        """
+        Wait for the writer to send queued responses, up to FLUSH_TIMEOUT
+        
+        Args:
+            writer: Running writer task
+        """
+        flushed = asyncio.ensure_future(self._outbox.join())
+        done, _ = await asyncio.wait(
+            {flushed, writer},
+            timeout=self.FLUSH_TIMEOUT,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        flushed.cancel()
+        
+        if not done:
+            self.logger.warning("Timed out sending queued responses")
+    
+    async def _read_line(self) -> str:
+        """
+        Read a line from stdin without blocking the event loop
+        
+        Returns:
+            Line read, without the trailing newline
+        
+        Raises:
+            EOFError: If stdin is closed
+        """
+        loop = asyncio.get_running_loop()
+        
+        while b"\n" not in self._stdin_buffer:
+            readable = loop.create_future()
+            
+            def on_readable():
+                if not readable.done():
+                    readable.set_result(None)
+            
+            try:
+                fd = sys.stdin.fileno()
+                loop.add_reader(fd, on_readable)
+            except (NotImplementedError, OSError, ValueError):
+                # No reader support for stdin here (e.g. Windows or a regular file)
+                return await loop.run_in_executor(self._executor, input)
+            
+            try:
+                await readable
+            finally:
+                loop.remove_reader(fd)
+            
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            self._stdin_buffer += chunk
+        
+        line, newline, self._stdin_buffer = self._stdin_buffer.partition(b"\n")
+        if not line and not newline:
+            raise EOFError("EOF when reading a line")
+        return line.decode("utf-8", errors="replace")
     
     async def run(self):
         """Main client loop - connects and processes messages"""
         self.logger.info(f"Connecting to WebSocket: {self.uri}")
         
         try:
-            async with websockets.connect(self.uri) as websocket:
+            # Unbounded receive queue and no per-frame compression keep the
+            # fragment stream cheap; default keepalive pings stay on since
+            # blocking work runs off the event loop
+            async with websockets.connect(
+                self.uri,
+                max_queue=None,
+                compression=None
+            ) as websocket:
                 self.logger.info("✓ Connected to WebSocket")
                 
-                async for raw_message in websocket:
-                    # Process message (handle fragments)
-                    processed_message = await self.handle_message(raw_message)
-                    
-                    # If waiting for more fragments, continue
-                    if processed_message is None:
-                        continue
-                    
-                    self.logger.info(f"Processing: {processed_message[:200]}...")
-                    
-                    if self.auto_mode:
-                        # Autonomous mode - use AI to decide response
-                        self.logger.info("→ Consulting AI agent...")
-                        response_data = self.agent.process_message(processed_message)
+                self._send_error = None
+                writer = asyncio.create_task(self._writer(websocket))
+                
+                try:
+                    while True:
+                        # Take frames as raw bytes: the JSON parser reads UTF-8
+                        # directly, so decoding text frames here is wasted work
+                        try:
+                            raw_message = await websocket.recv(decode=False)
+                        except websockets.exceptions.ConnectionClosedOK:
+                            break
                         
-                        if response_data:
-                            await self.send_response(websocket, response_data)
+                        # Process message (handle fragments)
+                        processed_message = self._handle_impl(raw_message)
+                        
+                        # If waiting for more fragments, continue
+                        if processed_message is None:
+                            continue
+                        
+                        self.logger.info("Processing: %.200s...", processed_message)
+                        
+                        if self.auto_mode:
+                            # Autonomous mode - use AI to decide response
+                            self.logger.info("→ Consulting AI agent...")
+                            # Run the blocking LLM call off the event loop
+                            try:
+                                response_data = await asyncio.get_running_loop().run_in_executor(
+                                    self._executor, self.agent.process_message, processed_message
+                                )
+                            except asyncio.CancelledError:
+                                # Tear down the in-flight LLM stream on Ctrl+C
+                                self.agent.close()
+                                raise
+                        
+                            if response_data:
+                                await self.send_response(websocket, response_data)
+                            else:
+                                self.logger.error("Agent could not generate response")
                         else:
-                            self.logger.error("Agent could not generate response")
-                    else:
-                        # Manual mode - wait for user input
-                        print("\n" + "="*70)
-                        print("MESSAGE RECEIVED:")
-                        print("-"*70)
-                        print(processed_message)
-                        print("-"*70)
-                        print("\nEnter JSON response (or 'quit'): ")
+                            # Manual mode - wait for user input
+                            print("\n" + "="*70)
+                            print("MESSAGE RECEIVED:")
+                            print("-"*70)
+                            print(processed_message)
+                            print("-"*70)
+                            print("\nEnter JSON response (or 'quit'): ")
                         
-                        user_input = input().strip()
-                        if user_input.lower() == 'quit':
-                            break
+                            user_input = (await self._read_line()).strip()
+                            if user_input.lower() == 'quit':
+                                break
                         
-                        try:
-                            response_data = json.loads(user_input)
-                            await self.send_response(websocket, response_data)
-                        except json.JSONDecodeError:
-                            self.logger.error("Invalid JSON input")
+                            try:
+                                response_data = json_loads(user_input)
+                                await self.send_response(websocket, response_data)
+                            except json.JSONDecodeError:
+                                self.logger.error("Invalid JSON input")
+                    
+                    # Let the writer send responses still queued on a normal exit
+                    if self._send_error is None and websocket.state is State.OPEN:
+                        await self._flush_outbox(writer)
+                finally:
+                    writer.cancel()
+                    await asyncio.gather(writer, return_exceptions=True)
+                    # Surface a failed send rather than the close it triggered
+                    if self._send_error is not None:
+                        raise self._send_error
                 
         except websockets.exceptions.WebSocketException as e:
             self.logger.error(f"WebSocket error: {e}")
@@ -4,6 +4,8 @@ Loads settings from environment variables with validation
 """
 
 import os
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -11,6 +13,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+@lru_cache(maxsize=1)
+def _read_prompt_file(path: str) -> str:
+    """Read and cache a system prompt file"""
+    return Path(path).read_text(encoding="utf-8").strip()
+
+
 class Config:
     """Configuration class with environment variable loading and validation"""
     
@@ -23,6 +31,7 @@ class Config:
     # WebSocket Configuration
     WEBSOCKET_URI: str = os.getenv("WEBSOCKET_URI", "")
     WEBSOCKET_TIMEOUT: int = int(os.getenv("WEBSOCKET_TIMEOUT", "30"))
+    WEBSOCKET_BATCH_SIZE: int = int(os.getenv("WEBSOCKET_BATCH_SIZE", "1"))
     
     # System Prompt Configuration
     SYSTEM_PROMPT: str = os.getenv("SYSTEM_PROMPT", "")
@@ -63,8 +72,7 @@ class Config:
         # Otherwise, load from file
         if cls.SYSTEM_PROMPT_FILE:
             try:
-                with open(cls.SYSTEM_PROMPT_FILE, 'r') as f:
-                    return f.read().strip()
+                return _read_prompt_file(cls.SYSTEM_PROMPT_FILE)
             except FileNotFoundError:
                 raise ValueError(f"System prompt file not found: {cls.SYSTEM_PROMPT_FILE}")
             except Exception as e:
@@ -82,6 +90,7 @@ class Config:
         print(f"Ollama API URL:      {cls.OLLAMA_API_URL}")
         print(f"Temperature:         {cls.OLLAMA_TEMPERATURE}")
         print(f"WebSocket URI:       {cls.WEBSOCKET_URI}")
+        print(f"Send Batch Size:     {cls.WEBSOCKET_BATCH_SIZE}")
         print(f"Auto Mode:           {cls.AUTO_MODE}")
         print(f"Fragment Recon:      {cls.ENABLE_FRAGMENT_RECONSTRUCTION}")
         print(f"Log Level:           {cls.LOG_LEVEL}")
@@ -5,6 +5,11 @@ Main entry point for autonomous AI agent
 import sys
 import asyncio
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 from .config import Config
 from .agent import OllamaAgent
 from .client import WebSocketClient
@@ -37,7 +42,7 @@ async def main():
     print()
     
     # Setup logging
-    logger = setup_logging(
+    logger, log_listener = setup_logging(
         Config.LOG_LEVEL,
         Config.LOG_FILE,
         Config.ENABLE_CONSOLE_LOG
@@ -50,11 +55,14 @@ async def main():
         agent = OllamaAgent(logger)
     except Exception as e:
         logger.error(f"Failed to initialize AI agent: {e}")
+        log_listener.stop()
         sys.exit(1)
     
     # Test Ollama connection
     if not agent.test_connection():
         logger.error("Cannot connect to Ollama. Exiting.")
+        agent.close()
+        log_listener.stop()
         print("\n❌ Cannot connect to Ollama")
         print("\nMake sure Ollama is running:")
         print("  1. Start Ollama: ollama serve")
@@ -79,13 +87,18 @@ async def main():
         print(f"\n❌ Fatal error: {e}")
         sys.exit(1)
     finally:
+        agent.close()
         logger.info("Agent shutdown complete")
+        log_listener.stop()
         print("\n✓ Agent shutdown complete")
         print(f"Session log saved to: {Config.LOG_FILE}\n")
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         sys.exit(0)
\ No newline at end of file
@@ -6,23 +6,45 @@ Includes logging, JSON extraction, and helper functions
 import os
 import json
 import logging
-import re
+import logging.handlers
+import queue
 from datetime import datetime
-from typing import Optional, Dict, Any
+from itertools import islice
+from typing import Optional, Dict, Any, Iterator, Tuple, Union
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
 
-def setup_logging(log_level: str, log_file: str, enable_console: bool = True) -> logging.Logger:
+# Common fragmentation indicators
+_FRAGMENT_KEYS = frozenset({'fragment', 'sequence', 'part', 'chunk', 'index'})
+_TOTAL_KEYS = frozenset({'total', 'total_fragments', 'total_parts', 'count'})
+_ID_KEYS = frozenset({'id', 'message_id'})
+
+# Rescans allowed after a stray quote, keeping extraction linear in the worst case
+_MAX_SCAN_RESTARTS = 16
+
+
+def setup_logging(
+    log_level: str,
+    log_file: str,
+    enable_console: bool = True
+) -> Tuple[logging.Logger, logging.handlers.QueueListener]:
     """
     Setup logging configuration
     
+    Records are handed to a queue and written by a background listener
+    thread, so file and console I/O never blocks the event loop.
+    
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR)
         log_file: Path to log file
         enable_console: Whether to enable console logging
     
     Returns:
-        Configured logger instance
+        (logger, listener) - stop the listener on shutdown to flush records
     """
     # Create logs directory if it doesn't exist
     log_path = Path(log_file)
@@ -43,7 +65,7 @@ def setup_logging(log_level: str, log_file: str, enable_console: bool = True) ->
         datefmt="%Y-%m-%d %H:%M:%S"
     )
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    handlers = [file_handler]
     
     # Console handler
     if enable_console:
@@ -54,51 +76,164 @@ def setup_logging(log_level: str, log_file: str, enable_console: bool = True) ->
             datefmt="%H:%M:%S"
         )
         console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+    
+    # Queue records from the caller and write them on the listener thread
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue,
+        *handlers,
+        respect_handler_level=True
+    )
+    listener.start()
+    
+    return logger, listener
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse JSON using orjson when available
+    
+    Args:
+        data: JSON text or bytes
     
-    return logger
+    Returns:
+        Parsed object
+    
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON bytes using orjson when available
+    
+    Args:
+        obj: Object to serialize
+    
+    Returns:
+        Encoded JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
 
-def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
+def _iter_json_spans(text: str, recover_unclosed: bool = True) -> Iterator[str]:
+    """
+    Yield candidate JSON object spans from text in a single linear pass
+    
+    Tracks brace depth while skipping over string literals, yielding each
+    outermost {...} span as it closes, followed by the objects nested inside
+    it so they are tried if the enclosing span is not valid JSON. If an
+    opening brace is never closed, the balanced objects nested inside it are
+    yielded at the end, or, when a stray quote left the scan inside a string,
+    the text after that brace is scanned again (a bounded number of times).
+    
+    Args:
+        text: Text that may contain JSON objects
+        recover_unclosed: Whether to recover objects after unclosed braces
+    
+    Returns:
+        Iterator of candidate substrings
+    """
+    children = {}   # parent start -> [(start, end)] of closed inner objects
+    
+    def walk(start: int, end: int) -> Iterator[str]:
+        # Depth-first, so a span's own children follow it directly
+        pending = [(start, end)]
+        while pending:
+            start, end = pending.pop()
+            yield text[start:end]
+            pending.extend(reversed(children.pop(start, ())))
+    
+    pos = 0
+    restarts = 0
+    while True:
+        stack = []      # start offsets of currently open braces
+        children.clear()
+        in_string = False
+        escape = False
+        
+        for i, char in enumerate(islice(text, pos, None), pos):
+            if in_string:
+                if escape:
+                    escape = False
+                elif char == '\\':
+                    escape = True
+                elif char == '"':
+                    in_string = False
+            elif char == '{':
+                stack.append(i)
+            elif not stack:
+                # Quotes in surrounding prose are not string delimiters
+                continue
+            elif char == '"':
+                in_string = True
+            elif char == '}':
+                start = stack.pop()
+                if stack:
+                    children.setdefault(stack[-1], []).append((start, i + 1))
+                else:
+                    yield from walk(start, i + 1)
+        
+        if not (recover_unclosed and stack):
+            return
+        
+        if in_string and restarts < _MAX_SCAN_RESTARTS:
+            # A quote inside a prose brace swallowed the rest of the text
+            pos = stack[0] + 1
+            restarts += 1
+            continue
+        
+        # Recover objects wrapped in a brace that was never closed
+        for parent in stack:
+            for start, end in children.pop(parent, ()):
+                yield from walk(start, end)
+        return
+
+
+def extract_json_from_text(text: str, partial: bool = False) -> Optional[Dict[str, Any]]:
     """
     Extract JSON object from text that may contain other content
     Handles LLM responses that include markdown formatting or extra text
     
     Args:
         text: Text that may contain JSON
+        partial: Text is a prefix of a response still being streamed; only
+            fully closed top-level objects outside any array are accepted
     
     Returns:
         Parsed JSON dict or None if not found
     """
     # Remove markdown code blocks if present
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```\s*', '', text)
+    if '```' in text:
+        text = text.replace('```json', '').replace('```', '')
+    
+    stripped = text.strip()
+    
+    # A response opening a top-level array or string may parse as a whole
+    # once complete, so an object inside it cannot be settled on early
+    if partial and stripped.startswith(('[', '"')):
+        return None
     
     # Try to parse the whole text as JSON
     try:
-        return json.loads(text.strip())
+        obj = json_loads(stripped)
+        if not partial or isinstance(obj, dict):
+            return obj
     except json.JSONDecodeError:
         pass
     
-    # Look for JSON objects (basic pattern)
-    pattern = r'\{[^{}]*\}'
-    matches = re.findall(pattern, text)
-    
-    for match in matches:
+    # Scan for balanced {...} objects
+    for candidate in _iter_json_spans(text, recover_unclosed=not partial):
         try:
-            obj = json.loads(match)
-            if isinstance(obj, dict):
-                return obj
-        except json.JSONDecodeError:
-            continue
-    
-    # Look for nested JSON objects
-    pattern = r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}'
-    matches = re.findall(pattern, text)
-    
-    for match in matches:
-        try:
-            obj = json.loads(match)
+            obj = json_loads(candidate)
             if isinstance(obj, dict):
                 return obj
         except json.JSONDecodeError:
@@ -138,19 +273,14 @@ def is_fragmented_message(data: Dict[str, Any]) -> bool:
     Returns:
         True if message appears to be fragmented
     """
-    # Common fragmentation indicators
-    fragment_keys = ['fragment', 'sequence', 'part', 'chunk', 'index']
-    total_keys = ['total', 'total_fragments', 'total_parts', 'count']
-    
-    has_fragment_indicator = any(key in data for key in fragment_keys)
-    has_total_indicator = any(key in data for key in total_keys)
+    if not isinstance(data, dict):
+        return False
     
-    # Also check for timestamp-based fragmentation
-    has_timestamp = 'timestamp' in data
-    has_id = 'id' in data or 'message_id' in data
+    keys = data.keys()
     
-    return (has_fragment_indicator or has_total_indicator or 
-            (has_timestamp and has_id))
+    # Fragment or total indicators, or timestamp-based fragmentation
+    return bool(keys & _FRAGMENT_KEYS or keys & _TOTAL_KEYS or
+                ('timestamp' in keys and keys & _ID_KEYS))
 
 
 def validate_json_structure(data: Any, required_keys: list = None) -> tuple[bool, Optional[str]]: